@@ -7,9 +7,10 @@ Usage:
 
 import os
 import asyncio
+import httpx
 from dotenv import load_dotenv
 from eth_account import Account
-from x402.clients.httpx import x402HttpxClient
+from x402.clients.httpx import x402HttpxClient, x402_payment_hooks
 from x402.clients.base import decode_x_payment_response
 
 load_dotenv()
@@ -25,38 +26,59 @@ account = Account.from_key(private_key)
 print(f"Account: {account.address}\n")
 
 
-async def test_with_budget(budget: str):
+async def test_with_budget(client: x402HttpxClient, budget: str):
     """Test endpoint with specific budget."""
     print(f"{'='*60}")
     print(f"Testing with budget: {budget}")
     print(f"{'='*60}")
-    
-    # x402HttpxClient automatically handles payment flow
-    async with x402HttpxClient(
-        account=account,
-        base_url=base_url,
-    ) as client:
-        # Add X-Budget header to the request
-        response = await client.get(
-            "/acp-budget",
-            headers={"X-Budget": budget}  # ⭐ Dynamic pricing
+
+    # The payment hooks are one-shot: after a successful payment the
+    # retry flag stays set and later 402s would be returned unpaid.
+    # Reinstall fresh hooks per budget; the connection pool is untouched.
+    client.event_hooks = x402_payment_hooks(account)
+
+    # Add X-Budget header to the request
+    response = await client.get(
+        "/acp-budget",
+        headers={"X-Budget": budget}  # ⭐ Dynamic pricing
+    )
+
+    content = await response.aread()
+    print(f"✅ Response: {content.decode()}")
+
+    if "X-PAYMENT-RESPONSE" in response.headers:
+        payment_resp = decode_x_payment_response(
+            response.headers["X-PAYMENT-RESPONSE"]
         )
-        
-        content = await response.aread()
-        print(f"✅ Response: {content.decode()}")
-        
-        if "X-PAYMENT-RESPONSE" in response.headers:
-            payment_resp = decode_x_payment_response(
-                response.headers["X-PAYMENT-RESPONSE"]
-            )
-            print(f"🧾 TX: {payment_resp.get('transaction', 'N/A')}\n")
+        print(f"🧾 TX: {payment_resp.get('transaction', 'N/A')}\n")
 
 
 async def main():
     """Run tests with different budgets."""
-    # await test_with_budget("$0.001")
-    await test_with_budget("$0.01")
-    # await test_with_budget("$0.05")
+    budgets = [
+        # "$0.001",
+        "$0.01",
+        # "$0.05",
+    ]
+
+    # x402HttpxClient automatically handles payment flow. Open it once and
+    # reuse its connection pool for every budget instead of paying the
+    # connect/TLS handshake per iteration. Extra kwargs are forwarded to
+    # httpx.AsyncClient: explicit pool limits keep connections warm under
+    # concurrency, and HTTP/2 lets requests multiplex over one connection
+    async with x402HttpxClient(
+        account=account,
+        base_url=base_url,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=30,
+        ),
+        http2=True,
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    ) as client:
+        for budget in budgets:
+            await test_with_budget(client, budget)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,201 @@
+"""Shared x402 plumbing for the FastAPI example server.
+
+Keeps the hot-path pieces — the CDP JWT cache, the dynamic-price payment
+middleware and the precomputed schema/response constants — in a single
+module so every server composition reuses one implementation instead of
+growing its own copy.
+"""
+import functools
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import orjson
+from starlette.middleware.base import BaseHTTPMiddleware
+from x402.fastapi.middleware import require_payment
+from x402.types import HTTPInputSchema
+from cdp.auth import generate_jwt, JwtOptions
+
+logger = logging.getLogger(__name__)
+
+# CDP credentials; populated by build_facilitator_config() so the server
+# can call load_dotenv() before any environment variables are read
+_CDP_API_KEY_ID: Optional[str] = None
+_CDP_API_KEY_SECRET: Optional[str] = None
+
+# CDP JWTs are valid for minutes, so regenerating them (PEM parsing, key
+# import, signing) on every facilitator call is pure waste. Cache each
+# token for a conservative TTL well under the JWT lifetime.
+_JWT_TTL_SECONDS = 30
+_jwt_cache: Dict[str, tuple] = {}  # request_path -> (token, expires_at)
+
+# Fixed header fragments; Correlation-Context is required by the CDP API
+_BEARER = "Bearer "
+_CORRELATION_CONTEXT = "sdk_version=1.33.1,sdk_language=python,source=x402,source_version=0.6.6"
+
+# Fully-built auth headers, keyed on the JWT pair so cache hits within the
+# JWT TTL return the same dict with no string or dict allocation at all
+_auth_headers_key = None
+_auth_headers = None
+
+
+def _cached_jwt(request_path: str) -> str:
+    """Return a cached CDP JWT for the given path, regenerating on expiry."""
+    now = time.monotonic()
+    cached = _jwt_cache.get(request_path)
+    if cached and cached[1] > now + 5:
+        return cached[0]
+
+    token = generate_jwt(
+        JwtOptions(
+            api_key_id=_CDP_API_KEY_ID,
+            api_key_secret=_CDP_API_KEY_SECRET,
+            request_method="POST",
+            request_host="api.cdp.coinbase.com",
+            request_path=request_path,
+        )
+    )
+    _jwt_cache[request_path] = (token, now + _JWT_TTL_SECONDS)
+    return token
+
+
+async def cdp_auth_headers():
+    """Create CDP authentication headers for Coinbase facilitator using official CDP SDK"""
+    global _auth_headers_key, _auth_headers
+
+    # Use official CDP SDK to create JWT tokens (cached with a short TTL)
+    verify_jwt = _cached_jwt("/platform/v2/x402/verify")
+    settle_jwt = _cached_jwt("/platform/v2/x402/settle")
+
+    # Rebuild the headers only when a JWT actually rotated
+    key = (verify_jwt, settle_jwt)
+    if key != _auth_headers_key:
+        _auth_headers = {
+            "verify": {
+                "Authorization": _BEARER + verify_jwt,
+                "Correlation-Context": _CORRELATION_CONTEXT,
+            },
+            "settle": {
+                "Authorization": _BEARER + settle_jwt,
+                "Correlation-Context": _CORRELATION_CONTEXT,
+            },
+        }
+        _auth_headers_key = key
+    return _auth_headers
+
+
+def build_facilitator_config() -> Optional[dict]:
+    """Build the Coinbase CDP facilitator config from the environment.
+
+    Returns None when CDP credentials are not configured, in which case
+    the caller should fall back to the default facilitator.
+    """
+    global _CDP_API_KEY_ID, _CDP_API_KEY_SECRET
+
+    _CDP_API_KEY_ID = os.getenv("CDP_API_KEY_ID")
+    _CDP_API_KEY_SECRET = os.getenv("CDP_API_KEY_SECRET")
+    if not _CDP_API_KEY_ID or not _CDP_API_KEY_SECRET:
+        return None
+
+    return {
+        "url": "https://api.cdp.coinbase.com/platform/v2/x402",
+        "create_headers": cdp_auth_headers,
+    }
+
+
+# Invariant pieces of the payment middleware configuration, built once at
+# import instead of per payment app construction
+_ACP_MIME = "application/json"
+
+# ⭐ Input schema for x402scan registration
+_ACP_INPUT_SCHEMA = HTTPInputSchema(
+    header_fields={
+        "X-Budget": {
+            "type": "string",
+            "required": False,
+            "description": "Optional budget amount in USD (e.g., $0.01). If not provided, defaults to $0.001",
+            "example": "$0.01"
+        }
+    }
+)
+
+
+# Exact paths gated by dynamic pricing; frozenset membership is a single
+# O(1) hash lookup rather than a substring scan per request
+_PAID_PATHS = frozenset({"/acp-budget"})
+
+
+# The /acp-budget payload varies only by request method, so serialize both
+# variants to bytes once at import
+_BUDGET_BODIES = {
+    method: orjson.dumps(
+        {
+            "message": "pay acp job budget",
+            "token": "acp job payment token",
+            "protocol": "x402",
+            "utility": "none",
+            "vibes": "acp early adopter",
+            "advice": "not financial advice",
+            "method": method,  # Show which method was used
+        }
+    )
+    for method in ("GET", "POST")
+}
+
+
+# Custom dynamic pricing middleware for /acp-budget
+class DynamicPriceMiddleware:
+    """Pure ASGI middleware that reads price from X-Budget header.
+
+    Implemented directly against the ASGI interface so that non-payment
+    traffic passes through with a single path check — no Request/Response
+    construction and no extra task hop from BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app, pay_to_address: str, network: str,
+                 facilitator_config: Optional[dict] = None):
+        self.app = app
+        self.pay_to_address = pay_to_address
+        self.network = network
+        self.facilitator_config = facilitator_config
+        # Payment middleware construction (schema objects, facilitator
+        # binding) is expensive, so cache one fully-built payment app per
+        # distinct budget value; lru_cache bounds the cache since the
+        # budget comes from a client-supplied header
+        self._payment_app = functools.lru_cache(maxsize=64)(self._build_payment_app)
+
+    def _build_payment_app(self, budget: str):
+        # Use the standard require_payment middleware with dynamic price
+        payment_middleware = require_payment(
+            path="/acp-budget",
+            price=budget,  # ⭐ dynamic price
+            pay_to_address=self.pay_to_address,
+            network=self.network,
+            facilitator_config=self.facilitator_config,
+            description=f"acp job budget ({budget})",
+            mime_type=_ACP_MIME,
+            max_deadline_seconds=300,  # ⭐ 5 minutes
+            input_schema=_ACP_INPUT_SCHEMA,
+        )
+
+        # require_payment returns a (request, call_next) dispatch function;
+        # wrap the downstream app with it once per budget value
+        return BaseHTTPMiddleware(self.app, dispatch=payment_middleware)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in _PAID_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        # Read dynamic price from the raw header tuples; keys arrive
+        # pre-lowercased, so no Headers multi-dict needs to be built
+        budget = "$0.001"
+        for key, value in scope["headers"]:
+            if key == b"x-budget":
+                budget = value.decode("latin-1")
+                break
+        # %-style formatting so no string work happens when DEBUG is off
+        logger.debug("📋 Dynamic budget from header: %s", budget)
+
+        await self._payment_app(budget)(scope, receive, send)
@@ -1,34 +1,48 @@
 import os
-from typing import Any, Dict
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from x402.fastapi.middleware import require_payment
-from x402.types import EIP712Domain, TokenAmount, TokenAsset, HTTPInputSchema
-from cdp.auth import generate_jwt, JwtOptions
+from fastapi.responses import HTMLResponse, Response
+from starlette.routing import Route
 
-# Configure logging
-import logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from _x402_common import (
+    _BUDGET_BODIES,
+    DynamicPriceMiddleware,
+    build_facilitator_config,
 )
 
 # Load environment variables
 load_dotenv()
 
+# Configure logging; defaults to INFO so per-request DEBUG output (and
+# every third-party library's DEBUG noise) is not formatted and written
+# under load. Set LOG_LEVEL=DEBUG to see the request-path logging.
+import logging
+_LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(
+    level=getattr(logging, _LOG_LEVEL, logging.INFO),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+# The HTTP client stack is chatty below WARNING; silence it explicitly
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("httpcore").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
 # Get configuration from environment
 ADDRESS = os.getenv("ADDRESS")
 CDP_API_KEY_ID = os.getenv("CDP_API_KEY_ID")
 CDP_API_KEY_SECRET = os.getenv("CDP_API_KEY_SECRET")
 NETWORK = os.getenv("NETWORK")
 
-print(f"🔍 Loading environment variables:")
-print(f"   ADDRESS: {ADDRESS}")
-print(f"   CDP_API_KEY_ID: {CDP_API_KEY_ID[:20] if CDP_API_KEY_ID else 'NOT SET'}...")
-print(f"   CDP_API_KEY_SECRET: {'SET' if CDP_API_KEY_SECRET else 'NOT SET'} ({len(CDP_API_KEY_SECRET) if CDP_API_KEY_SECRET else 0} chars)")
+logger.info("🔍 Loading environment variables:")
+logger.info("   ADDRESS: %s", ADDRESS)
+logger.info("   CDP_API_KEY_ID: %s...", CDP_API_KEY_ID[:20] if CDP_API_KEY_ID else "NOT SET")
+logger.info(
+    "   CDP_API_KEY_SECRET: %s (%d chars)",
+    "SET" if CDP_API_KEY_SECRET else "NOT SET",
+    len(CDP_API_KEY_SECRET) if CDP_API_KEY_SECRET else 0,
+)
 
 if not ADDRESS:
     raise ValueError("Missing required environment variable: ADDRESS")
@@ -42,130 +56,50 @@ static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+# Load the favicon into memory once at startup; browsers request
+# /favicon.ico reflexively, and a FileResponse would still stat and open
+# the file on every send. Serving preloaded bytes costs zero syscalls.
+_FAVICON_PATH = os.path.join(static_dir, "favicon.ico")
+_FAVICON_BYTES = None
+if os.path.exists(_FAVICON_PATH):
+    with open(_FAVICON_PATH, "rb") as f:
+        _FAVICON_BYTES = f.read()
+_FAVICON_RESPONSE = (
+    Response(content=_FAVICON_BYTES, media_type="image/x-icon")
+    if _FAVICON_BYTES is not None
+    else Response(status_code=404)
+)
 
-# Coinbase Facilitator configuration
-def create_cdp_auth_headers():
-    """Create CDP authentication headers for Coinbase facilitator using official CDP SDK"""
-    if not CDP_API_KEY_ID or not CDP_API_KEY_SECRET:
-        # Fall back to default facilitator if no CDP credentials
-        return None
-    
-    async def async_create_headers():
-        request_host = "api.cdp.coinbase.com"
-        
-        # Use official CDP SDK to create JWT tokens
-        verify_options = JwtOptions(
-            api_key_id=CDP_API_KEY_ID,
-            api_key_secret=CDP_API_KEY_SECRET,
-            request_method="POST",
-            request_host=request_host,
-            request_path="/platform/v2/x402/verify",
-        )
-        verify_jwt = generate_jwt(verify_options)
-        
-        settle_options = JwtOptions(
-            api_key_id=CDP_API_KEY_ID,
-            api_key_secret=CDP_API_KEY_SECRET,
-            request_method="POST",
-            request_host=request_host,
-            request_path="/platform/v2/x402/settle",
-        )
-        settle_jwt = generate_jwt(settle_options)
-        
-        # Add Correlation-Context header as required by CDP API
-        correlation_context = "sdk_version=1.33.1,sdk_language=python,source=x402,source_version=0.6.6"
-        
-        return {
-            "verify": {
-                "Authorization": f"Bearer {verify_jwt}",
-                "Correlation-Context": correlation_context,
-            },
-            "settle": {
-                "Authorization": f"Bearer {settle_jwt}",
-                "Correlation-Context": correlation_context,
-            },
-        }
-    
-    return async_create_headers
-
-
-# Determine facilitator config
-facilitator_config = None
-if CDP_API_KEY_ID and CDP_API_KEY_SECRET:
-    facilitator_config = {
-        "url": "https://api.cdp.coinbase.com/platform/v2/x402",
-        "create_headers": create_cdp_auth_headers(),
-    }
-    print("✅ Using Coinbase CDP Facilitator")
+
+# Determine facilitator config; fall back to the default facilitator when
+# no CDP credentials are configured
+facilitator_config = build_facilitator_config()
+if facilitator_config:
+    logger.info("✅ Using Coinbase CDP Facilitator")
 else:
-    print("⚠️  Using default facilitator (x402.org) - may have issues with mainnet")
-    print("   To use Coinbase facilitator, set CDP_API_KEY_ID and CDP_API_KEY_SECRET")
-
-
-# Custom dynamic pricing middleware for /acp-budget
-async def dynamic_price_middleware(request: Request, call_next):
-    """Middleware that reads price from X-Budget header"""
-    if not request.url.path.startswith("/acp-budget"):
-        return await call_next(request)
-    
-    # Read dynamic price from X-Budget header
-    budget = request.headers.get("X-Budget", "$0.001")
-    print(f"📋 Dynamic budget from header: {budget}")
-    
-    # Use the standard require_payment middleware with dynamic price
-    payment_middleware = require_payment(
-        path="/acp-budget",
-        price=budget,  # ⭐ dynamic price
-        pay_to_address=ADDRESS,
-        network=NETWORK,
-        facilitator_config=facilitator_config,
-        description=f"acp job budget ({budget})",
-        mime_type="application/json",
-        max_deadline_seconds=300,  # ⭐ 5 minutes
-
-        # ⭐ Define input schema for x402scan registration
-        input_schema=HTTPInputSchema(
-            header_fields={
-                "X-Budget": {
-                    "type": "string",
-                    "required": False,
-                    "description": "Optional budget amount in USD (e.g., $0.01). If not provided, defaults to $0.001",
-                    "example": "$0.01"
-                }
-            }
-        ),
-    )
-    
-    return await payment_middleware(request, call_next)
-
-# Apply dynamic pricing middleware
-app.middleware("http")(dynamic_price_middleware)
-
-# # Apply payment middleware to premium routes
-# app.middleware("http")(
-#     require_payment(
-#         path="/premium/*",
-#         price=TokenAmount(
-#             amount="10000",
-#             asset=TokenAsset(
-#                 address="0x036CbD53842c5426634e7929541eC2318f3dCF7e",
-#                 decimals=6,
-#                 eip712=EIP712Domain(name="USDC", version="2"),
-#             ),
-#         ),
-#         pay_to_address=ADDRESS,
-#         network=NETWORK,
-#     )
-# )
-
-
-@app.get("/")
-async def health_check():
-    """Health check endpoint that also serves as site metadata"""
-    from fastapi.responses import HTMLResponse
-    
-    # Return HTML with meta tags for better x402scan integration
-    html_content = """
+    logger.warning("⚠️  Using default facilitator (x402.org) - may have issues with mainnet")
+    logger.warning("   To use Coinbase facilitator, set CDP_API_KEY_ID and CDP_API_KEY_SECRET")
+
+
+# Nested app for the paid endpoint, carrying only the payment middleware.
+# Static/health traffic on the outer app never traverses it, and the paid
+# path runs the minimum possible stack. Attached below with a Route rather
+# than app.mount() because Mount's path matching would redirect the bare
+# /acp-budget URL to /acp-budget/, which x402 clients don't follow.
+budget_app = FastAPI()
+budget_app.add_middleware(
+    DynamicPriceMiddleware,
+    pay_to_address=ADDRESS,
+    network=NETWORK,
+    facilitator_config=facilitator_config,
+)
+
+
+# HTML with meta tags for better x402scan integration. The payload is
+# invariant, so encode it into a response once at import instead of
+# rebuilding (and re-encoding to UTF-8) on every probe hit
+_HEALTH_RESPONSE = HTMLResponse(
+    content="""
     <!DOCTYPE html>
     <html>
     <head>
@@ -176,7 +110,7 @@ async def health_check():
         <meta property="og:title" content="Virtuals Protocol ACP">
         <meta property="og:description" content="Pay for ACP jobs with x402 protocol">
         <meta property="og:site_name" content="Virtuals Protocol">
-        <link rel="icon" href="/favicon.ico">
+        <link rel="icon" href="/static/favicon.ico">
     </head>
     <body>
         <h1>Virtuals Protocol - ACP Job Payment</h1>
@@ -185,52 +119,56 @@ async def health_check():
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content)
+)
 
 
-@app.get("/favicon.ico")
-async def favicon():
+async def health_check(request: Request) -> Response:
+    """Health check endpoint that also serves as site metadata"""
+    return _HEALTH_RESPONSE
+
+
+async def favicon(request: Request) -> Response:
     """Serve favicon for x402scan to display as resource icon"""
-    favicon_path = os.path.join(os.path.dirname(__file__), "static", "favicon.ico")
-    if os.path.exists(favicon_path):
-        return FileResponse(favicon_path, media_type="image/x-icon")
-    # Return a default response if favicon doesn't exist
-    return FileResponse(favicon_path, media_type="image/x-icon", status_code=404)
+    return _FAVICON_RESPONSE
 
 
-@app.api_route("/acp-budget", methods=["GET", "POST"])
-async def acp_budget(request: Request) -> Dict[str, Any]:
+async def acp_budget(request: Request) -> Response:
     """
     Handle both GET and POST requests for ACP budget payment.
     x402scan may use either method depending on the request.
     """
-    from fastapi.responses import JSONResponse
-    
-    response_data = {
-        "message": "pay acp job budget",
-        "token": "acp job payment token",
-        "protocol": "x402",
-        "utility": "none",
-        "vibes": "acp early adopter",
-        "advice": "not financial advice",
-        "method": request.method  # Show which method was used
-    }
-    
+    # Bodies are precomputed per method; declaring Content-Length keeps the
+    # response out of chunked transfer framing. HEAD (auto-added by the
+    # Route alongside GET) reuses the GET body and the server strips it.
+    body = _BUDGET_BODIES.get(request.method, _BUDGET_BODIES["GET"])
+
     # Explicitly disable compression for x402scan compatibility
-    return JSONResponse(
-        content=response_data,
+    return Response(
+        content=body,
+        media_type="application/json",
         headers={
             "Content-Encoding": "identity",  # Tell CloudFlare: no compression
             "Cache-Control": "no-transform",  # Prevent any transformation
+            "Content-Length": str(len(body)),
         }
     )
 
 
-# @app.get("/premium/content")
-# async def get_premium_content() -> Dict[str, Any]:
-#     return {
-#         "content": "This is premium content",
-#     }
+# Register the trivial handlers as plain starlette Routes, which return
+# the precomputed Response singletons without going through FastAPI's
+# dependency-injection scaffolding, and attach the paid sub-app on its
+# exact path. The budget route lives on budget_app so it still runs
+# behind the payment middleware.
+budget_app.router.routes.append(
+    Route("/acp-budget", acp_budget, methods=["GET", "POST"])
+)
+app.router.routes.extend(
+    [
+        Route("/", health_check, methods=["GET"]),
+        Route("/favicon.ico", favicon, methods=["GET"]),
+        Route("/acp-budget", endpoint=budget_app, methods=["GET", "POST"]),
+    ]
+)
 
 
 if __name__ == "__main__":
@@ -27,40 +27,42 @@ CHAIN_ID_TO_NETWORK = {
 }
 
 
+# Networks already in standard format
+_STANDARD_NETWORKS = frozenset(EVM_NETWORK_TO_CHAIN_ID)
+
+# Unified lookup covering every accepted spelling (standard name, CAIP-2
+# identifier, bare chain ID string), so normalization is a single dict hit
+_ANY_TO_NETWORK = {
+    **{network: network for network in _STANDARD_NETWORKS},
+    **CAIP2_TO_NETWORK,
+    **{str(chain_id): network for chain_id, network in CHAIN_ID_TO_NETWORK.items()},
+}
+
+
 def normalize_network(network: str) -> str:
     """
     Normalize network identifier to standard format.
-    
+
     Accepts:
     - Standard format: "base", "base-sepolia", etc.
     - CAIP-2 format: "eip155:8453", "eip155:84532", etc.
     - Chain ID: "8453", "84532", etc.
-    
+
     Returns:
         Normalized network name in standard format
-        
+
     Raises:
         ValueError: If network format is not recognized
     """
-    # Already in standard format
-    if network in ["base", "base-sepolia", "avalanche-fuji", "avalanche"]:
-        return network
-    
-    # CAIP-2 format (eip155:chainId)
+    normalized = _ANY_TO_NETWORK.get(network)
+    if normalized is not None:
+        return normalized
+
+    # Unrecognized input: classify it so the error stays specific
     if network.startswith("eip155:"):
-        normalized = CAIP2_TO_NETWORK.get(network)
-        if normalized:
-            return normalized
         raise ValueError(f"Unsupported CAIP-2 network: {network}")
-    
-    # Try as chain ID
-    try:
-        chain_id = int(network)
-        normalized = CHAIN_ID_TO_NETWORK.get(chain_id)
-        if normalized:
-            return normalized
-        raise ValueError(f"Unsupported chain ID: {chain_id}")
-    except ValueError:
-        pass
-    
+
+    if network.isdigit():
+        raise ValueError(f"Unsupported chain ID: {network}")
+
     raise ValueError(f"Unsupported network format: {network}")